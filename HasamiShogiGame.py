@@ -1,21 +1,130 @@
 # Author: Gregory Melsby
 # Date: 11/23/2021
-# Description: Contains classes HasamiShogiGame, Board, and Piece.
+# Description: Contains classes HasamiShogiGame and Board.
 # HasamiShogiGame models a game of Hasami Shogi and has a private data member board.
-# A Board has a list of lists which represents the board and has Pieces.
+# A Board stores the pieces of each color as a bitboard, an int with one bit per square.
 # The play method of HasamiShogiGame lets the user play the game with inputs in algebraic notation.
 
+import random
+import sys
+from functools import lru_cache
+
+# piece colors, used in place of string literals so comparisons between them short-circuit on identity
+BLACK = 'BLACK'
+RED = 'RED'
+NONE = 'NONE'
+
+# seed for the private generator that draws zobrist keys
+ZOBRIST_SEED = 0x5A5B6F
+
+try:
+    # counts set bits in C, available from Python 3.10
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(bitboard):
+        """Returns the number of set bits in the bitboard"""
+        return bin(bitboard).count('1')
+
+
+@lru_cache(maxsize=None)
+def square_indices(size):
+    """Returns a dict mapping every square string on a board of the passed in size to its bit index"""
+    return {chr(97 + row) + str(col + 1): row * size + col for row in range(size) for col in range(size)}
+
+
+@lru_cache(maxsize=None)
+def between_masks(size):
+    """
+    Returns a dict mapping (from index, to index) pairs of distinct squares sharing a row or column
+    on a board of the passed in size to a bitboard of the squares a piece passes over moving between them.
+    The mask includes the destination square but not the origin square.
+    """
+    masks = {}
+    for start in range(size * size):
+        row, col = divmod(start, size)
+        for step, count in ((1, size - 1 - col), (-1, col), (size, size - 1 - row), (-size, row)):
+            mask = 0
+            end = start
+            for _ in range(count):
+                end += step
+                mask |= 1 << end
+                masks[start, end] = mask
+
+    return masks
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(size):
+    """
+    Returns a list with one (black key, red key) pair of random 64 bit ints per square on a board of the passed in size.
+    A position's hash is the XOR of the keys of every occupied square for the color occupying it.
+    Keys come from a private generator seeded from ZOBRIST_SEED and the size, so they are the same on every run
+    and drawing them leaves the global random module's sequence untouched.
+    """
+    generator = random.Random(ZOBRIST_SEED + size)
+    return [(generator.getrandbits(64), generator.getrandbits(64)) for _ in range(size * size)]
+
+
+def corner_masks(size):
+    """
+    Returns a tuple with one (corner mask, neighbors mask) pair per corner of a board of the passed in size,
+    where neighbors mask has the two squares orthogonally adjacent to the corner set.
+    """
+    last = size - 1
+    corners = []
+    for row, col in ((0, 0), (0, last), (last, 0), (last, last)):
+        vertical = 1 if row == 0 else -1
+        horizontal = 1 if col == 0 else -1
+        corner = row * size + col
+        corners.append((1 << corner, 1 << (corner + vertical * size) | 1 << (corner + horizontal)))
+
+    return tuple(corners)
+
+
+def corner_neighbors_mask(size):
+    """Returns a bitboard of every square orthogonally adjacent to a corner on a board of the passed in size"""
+    mask = 0
+    for _, neighbors in corner_masks(size):
+        mask |= neighbors
+
+    return mask
+
+
+def column_mask(size, col):
+    """Returns a bitboard of every square in the column (index starts at 1) on a board of the passed in size"""
+    return sum(1 << (row * size + col - 1) for row in range(size))
+
+
+# square string to bit index table for the default 9x9 board
+SQUARE_INDICES = square_indices(9)
+
+# player colors indexed by the active player number, flipping the number with ^ 1 switches player
+COLOR_NAMES = (BLACK, RED)
+PLAYER_NUMBERS = {BLACK: 0, RED: 1}
+
+# summary printed before each turn of play, filled with the number of BLACK and RED pieces captured
+# (by RED and BLACK respectively) and the active player
+TURN_SUMMARY_TEMPLATE = ('RED has captured %d opposing pieces.\n'
+                         'BLACK has captured %d opposing pieces.\n'
+                         "It is %s's turn.\n")
+
+# board display symbols indexed by red bit | black bit << 1 of a square
+SQUARE_SYMBOLS = ('-', 'R', 'B')
+
 
 class HasamiShogiGame:
     """
-    Models a game of Hasami Shogi. Has private data members board, game state, and active player.
+    Models a game of Hasami Shogi. Has private data members board, game state, active player,
+    and history (a stack of records for undoing moves)
     """
 
     def __init__(self):
         """Creates a game of Hasami Shogi. First player defaults to 'BLACK'"""
         self._board = Board()
         self._game_state = 'UNFINISHED'
-        self._active_player = 'BLACK'
+        # index into COLOR_NAMES, 0 for 'BLACK' and 1 for 'RED'
+        self._active_player = 0
+        self._history = []
 
     def get_game_state(self):
         """Returns a string of the current game state"""
@@ -23,7 +132,7 @@ class HasamiShogiGame:
 
     def get_active_player(self):
         """Returns a string of the current active player"""
-        return self._active_player
+        return COLOR_NAMES[self._active_player]
 
     def get_num_captured_pieces(self, color):
         """Returns the number of pieces of the color that have been captured"""
@@ -38,31 +147,46 @@ class HasamiShogiGame:
         if self._game_state != "UNFINISHED":
             return False
 
-        if not self._board.make_move(square_from, square_to, self._active_player):
+        undo = self._board.make_move(square_from, square_to, COLOR_NAMES[self._active_player])
+        if not undo:
             return False
 
+        self._history.append((undo, self._game_state))
         self.update_game_state()
         self.switch_active_player()
         return True
 
+    def unmake_move(self):
+        """
+        Takes back the most recent move, restoring the captured pieces, game state, and turn.
+        Returns False if there is no move to take back, otherwise returns True.
+        """
+        if not self._history:
+            return False
+
+        undo, self._game_state = self._history.pop()
+        self._board.unmake_move(undo)
+        self.switch_active_player()
+        return True
+
     def update_game_state(self):
         """Checks if the active player has won the game. If so, updates the game state."""
-        passing_player = {'BLACK': 'RED', 'RED': 'BLACK'}[self._active_player]
+        passing_player = COLOR_NAMES[self._active_player ^ 1]
 
         if self.get_num_captured_pieces(passing_player) >= 8:
-            self._game_state = f'{self._active_player}_WON'
+            self._game_state = f'{COLOR_NAMES[self._active_player]}_WON'
 
     def switch_active_player(self):
         """Switches active player, if Black switches to Red, if Red switches to Black"""
-        self._active_player = {'BLACK': 'RED', 'RED': 'BLACK'}[self._active_player]
+        self._active_player ^= 1
 
     def get_square_occupant(self, square):
         """Returns the color of the piece that occupies the square. 'NONE' if no piece occupies the square."""
         return self._board.get_square_occupant_color(square)
 
-    def display_board(self):
-        """Displays the current state of the board."""
-        self._board.display()
+    def display_board(self, file=None):
+        """Displays the current state of the board to the passed in file, defaults to sys.stdout."""
+        self._board.display(file)
 
     def play(self):
         """Sets up and plays the game until a player wins."""
@@ -71,12 +195,10 @@ class HasamiShogiGame:
 
         while self._game_state == 'UNFINISHED':
 
-            # displays the number of pieces each player has captured
-            for color, op_color in {"RED": "BLACK", "BLACK": "RED"}.items():
-                print(f'{color} has captured {self.get_num_captured_pieces(op_color)} opposing pieces.')
-
-            # displays the current player
-            print(f"It is {self._active_player}'s turn.\n")
+            # displays the number of pieces each player has captured and the current player
+            print(TURN_SUMMARY_TEMPLATE % (self.get_num_captured_pieces(BLACK),
+                                           self.get_num_captured_pieces(RED),
+                                           self.get_active_player()))
 
             # displays board
             self._board.display()
@@ -86,7 +208,7 @@ class HasamiShogiGame:
             legal_move = False
             while not legal_move:
 
-                move = input(f"{self._active_player}, enter your move: ")
+                move = input(f"{self.get_active_player()}, enter your move: ")
 
                 try:
                     from_square, to_square = move.split(", ")
@@ -105,8 +227,14 @@ class HasamiShogiGame:
 
 class Board:
     """
-    Represents a Hasami Shogi board as a list of lists.
-    Has private data members grid (list of lists) and size (default size is 9)
+    Represents a Hasami Shogi board as a pair of bitboards.
+    Has private data members red and black (ints with bit row * size + col set if a piece of that color
+    occupies the square, row and col starting at 0), size (default size is 9), square indices
+    (maps square strings to bit indices), between (the move path masks for the board size),
+    not first column and not last column (inverted column masks that stop shifted bitboards
+    wrapping between rows),
+    corners and corner neighbors (masks of each corner and the squares that can capture it),
+    zobrist (random keys per square and color), and hash (the zobrist hash of the current position)
     """
 
     def __init__(self, size=9):
@@ -114,194 +242,204 @@ class Board:
         Creates a Hasami Shogi board and populates it with pieces in default starting position.
         Default size is 9x9 but this can be changed by passing in a parameter.
         """
-        self._grid = []
         self._size = size
-        self._grid.append([Piece('RED') for col in range(size)])
-        self._grid.extend([[None for col in range(size)] for row in range(size - 2)])
-        self._grid.append([Piece('BLACK') for col in range(size)])
+        self._square_indices = square_indices(size)
+        self._between = between_masks(size)
+        self._not_first_column = ~column_mask(size, 1)
+        self._not_last_column = ~column_mask(size, size)
+        self._corners = corner_masks(size)
+        self._corner_neighbors = corner_neighbors_mask(size)
+        row_mask = (1 << size) - 1
+        self._red = row_mask
+        self._black = row_mask << (size * (size - 1))
+        self._zobrist = zobrist_keys(size)
+        self._hash = self.hash_squares(self._black, BLACK) ^ self.hash_squares(self._red, RED)
 
     def get_num_captured_pieces(self, color):
         """Returns the number of captured pieces of the passed in color."""
-        result = self._size
-        for row in self._grid:
-            result -= sum(square is not None and square.get_color() == color for square in row)
+        if color == RED:
+            return self._size - popcount(self._red)
+        if color == BLACK:
+            return self._size - popcount(self._black)
+
+        # no pieces match any other color
+        return self._size
+
+    def hash_squares(self, bitboard, color):
+        """Returns the XOR of the zobrist keys for pieces of the passed in color on every square set in the bitboard"""
+        player = PLAYER_NUMBERS[color]
+        result = 0
+        while bitboard:
+            lowest = bitboard & -bitboard
+            result ^= self._zobrist[lowest.bit_length() - 1][player]
+            bitboard ^= lowest
 
         return result
 
-    @staticmethod
-    def translate_square(square):
-        """Returns a tuple containing row, column as ints (index starts at 1)"""
-        # converts the passed in letter to row number using ascii
-        row = ord(square[0]) - 96
-        # returns -1 for col if passed in value is not castable to int
-        try:
-            col = int(square[1:])
-        except ValueError:
-            col = -1
-
-        return row, col
-
     def get_square_occupant_color(self, square):
         """Returns the color of the piece occupying the square, returns 'NONE' if no piece"""
-        row, col = self.translate_square(square)
-        if 0 >= row or row > self._size or 0 >= col or col > self._size:
-            return 'NONE'
+        index = self._square_indices.get(square)
+        if index is None:
+            return NONE
 
-        occupant = self._grid[row - 1][col - 1]
-        if occupant is None:
-            return 'NONE'
+        mask = 1 << index
+        if self._red & mask:
+            return RED
+        if self._black & mask:
+            return BLACK
 
-        return occupant.get_color()
+        return NONE
 
-    def is_legal_move(self, from_square, to_square, color):
+    def is_legal_move(self, from_index, to_index, color):
         """
-        Takes in origin square, destination square, and moving player color.
-        Returns True if move is legal, False if not
+        Takes in origin square index, destination square index, and moving player color.
+        Returns the move mask (origin and destination bits) if move is legal, 0 if not.
         """
-        # makes sure inputted squares are at least length 2
-        if len(from_square) < 2 or len(to_square) < 2:
-            return False
-
-        # makes sure piece to be moved matches color passed in
-        # if from_square out of bounds, get_square_occupant_color also returns "NONE"
-        if color != self.get_square_occupant_color(from_square):
-            return False
-
-        from_row, from_col = self.translate_square(from_square)
-        to_row, to_col = self.translate_square(to_square)
+        # the move must stay within one row or column
+        path = self._between.get((from_index, to_index))
+        if path is None:
+            return 0
 
-        # makes sure destination is within bounds
-        if 0 >= to_row or to_row > self._size or 0 >= to_col or to_col > self._size:
-            return False
-
-        # checks if the move is horizontal
-        if from_row == to_row:
-            direction = 1 if to_col > from_col else -1
-            while to_col * direction > from_col * direction:
-                from_col += direction
-                if self._grid[from_row - 1][from_col - 1] is not None:
-                    return False
+        # makes sure piece to be moved matches color passed in, which must be RED or BLACK
+        if color == RED:
+            own = self._red
+        elif color == BLACK:
+            own = self._black
+        else:
+            return 0
 
-            return True
+        origin = 1 << from_index
+        if not own & origin:
+            return 0
 
-        # checks if the move is vertical
-        if from_col == to_col:
-            direction = 1 if to_row > from_row else -1
-            while to_row * direction > from_row * direction:
-                from_row += direction
-                if self._grid[from_row - 1][from_col - 1] is not None:
-                    return False
+        # the move must pass over only empty squares
+        if (self._red | self._black) & path:
+            return 0
 
-            return True
-
-        return False
+        return origin | 1 << to_index
 
     def make_move(self, from_square, to_square, color):
         """
         Attempts to make the requested move from from_square to to_square by the player of passed in color.
         Returns False if move is not legal.
-        If legal, moves the piece and removes any captured pieces. Then returns True.
+        If legal, moves the piece and removes any captured pieces. Then returns an undo record,
+        a tuple of color, move mask, captured mask, and previous hash that can be passed to unmake_move.
         """
-        if not self.is_legal_move(from_square, to_square, color):
+        # square strings are translated once here, everything below works with square indices
+        from_index = self._square_indices.get(from_square)
+        to_index = self._square_indices.get(to_square)
+        if from_index is None or to_index is None:
             return False
 
-        from_row, from_col = self.translate_square(from_square)
-        to_row, to_col = self.translate_square(to_square)
-
-        # moves piece to new square, puts None in old square
-        self._grid[to_row - 1][to_col - 1] = self._grid[from_row - 1][from_col - 1]
-        self._grid[from_row - 1][from_col - 1] = None
-
-        self.remove_captures(to_square)
-        return True
-
-    def remove_captures(self, square):
-        """Removes pieces captured by the piece on the passed in square string"""
-        row, col = self.translate_square(square)
-        piece = self._grid[row - 1][col - 1]
-        if piece is None:
+        move = self.is_legal_move(from_index, to_index, color)
+        if not move:
             return False
 
-        color = piece.get_color()
-
-        remove_coords = []
-
-        # deals with standard capture cases
-        for x, y in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            trial_row = row + y
-            trial_col = col + x
-
-            while 0 < trial_row <= self._size and 0 < trial_col <= self._size:
-                candidate_piece = self._grid[trial_row - 1][trial_col - 1]
-                if candidate_piece is None:
-                    break
-
-                if candidate_piece.get_color() == color:
-                    trial_row -= y
-                    trial_col -= x
-
-                    while trial_row * y > row * y or trial_col * x > col * x:
-                        remove_coords.append((trial_col, trial_row))
-                        trial_row -= y
-                        trial_col -= x
-                    break
-
-                trial_row += y
-                trial_col += x
-
-        # deals with corner cases
-        if (col, row) in [(1, 2), (2, 1), (self._size, self._size - 1), (self._size - 1, self._size)]:
-            # reflection across diagonal
-            reflection = self._grid[col - 1][row - 1]
-            if reflection is not None and reflection.get_color() == color:
-                if row == 1 or col == 1:
-                    corner = self._grid[0][0]
-                    if corner is not None and corner.get_color() != color:
-                        remove_coords.append((1, 1))
-                else:
-                    corner = self._grid[self._size - 1][self._size - 1]
-                    if corner is not None and corner.get_color() != color:
-                        remove_coords.append((self._size, self._size))
-
-        # reflection across the other diagonal
-        if (col, row) in [(1, self._size - 1), (self._size - 1, 1), (2, self._size), (self._size, 2)]:
-            reflection = self._grid[9 - col][9 - row]
-            if reflection is not None and reflection.get_color() == color:
-                if row == self._size - 1 or col == 2:
-                    corner = self._grid[self._size - 1][0]
-                    if corner is not None and corner.get_color() != color:
-                        remove_coords.append((1, self._size))
-                else:
-                    corner = self._grid[0][self._size - 1]
-                    if corner is not None and corner.get_color() != color:
-                        remove_coords.append((self._size, 1))
+        # clears the origin bit and sets the destination bit of the moving color
+        player = PLAYER_NUMBERS[color]
+        if player:
+            self._red ^= move
+        else:
+            self._black ^= move
+        previous_hash = self._hash
+        self._hash ^= self._zobrist[from_index][player] ^ self._zobrist[to_index][player]
+
+        captured = self.remove_captures(to_index)
+        return color, move, captured, previous_hash
+
+    def unmake_move(self, undo):
+        """Takes back a move using the undo record returned by make_move, restoring any captured pieces"""
+        color, move, captured, self._hash = undo
+        if color == RED:
+            self._red ^= move
+            self._black |= captured
+        else:
+            self._black ^= move
+            self._red |= captured
+
+    def remove_captures(self, index):
+        """Removes pieces captured by the piece on the passed in square index. Returns a mask of the captured pieces."""
+        mask = 1 << index
+        if self._red & mask:
+            color, friendly, enemy = RED, self._red, self._black
+        elif self._black & mask:
+            color, friendly, enemy = BLACK, self._black, self._red
+        else:
+            return 0
+
+        captured = 0
+
+        # deals with standard capture cases by sliding a front along each direction
+        # while it covers enemy pieces, capturing the run if it ends on a friendly piece
+        size = self._size
+        not_first_column = self._not_first_column
+        not_last_column = self._not_last_column
+
+        # east, masking out bits that wrapped around to the first column
+        run = 0
+        front = (mask << 1) & not_first_column & enemy
+        while front:
+            run |= front
+            front = (front << 1) & not_first_column
+            if front & friendly:
+                captured |= run
+            front &= enemy
+
+        # west, masking out bits that wrapped around to the last column
+        run = 0
+        front = (mask >> 1) & not_last_column & enemy
+        while front:
+            run |= front
+            front = (front >> 1) & not_last_column
+            if front & friendly:
+                captured |= run
+            front &= enemy
+
+        # south, bits shifted past the last row are masked out by the color bitboards
+        run = 0
+        front = (mask << size) & enemy
+        while front:
+            run |= front
+            front <<= size
+            if front & friendly:
+                captured |= run
+            front &= enemy
+
+        # north
+        run = 0
+        front = (mask >> size) & enemy
+        while front:
+            run |= front
+            front >>= size
+            if front & friendly:
+                captured |= run
+            front &= enemy
+
+        # deals with corner cases, a corner piece is captured by enemies on both of its neighbors
+        if mask & self._corner_neighbors:
+            for corner, neighbors in self._corners:
+                if mask & neighbors and friendly & neighbors == neighbors:
+                    captured |= enemy & corner
 
         # removes the pieces to be removed
-        for remove_col, remove_row in remove_coords:
-            self._grid[remove_row - 1][remove_col - 1] = None
-
-    def display(self):
-        """Prints the board"""
-        print(' ', *range(1, self._size + 1))
-        for index, row in enumerate(self._grid):
-            print(chr(97 + index), end=' ')
-
-            for piece in row:
-                if piece is None:
-                    print('-', end=' ')
-                else:
-                    print(piece.get_color()[0], end=' ')
-
-            print('')
-
-
-class Piece:
-    """Represents a Hasami Shogi game piece"""
-
-    def __init__(self, color):
-        """Creates a Hasami Shogi game piece"""
-        self._color = color
-
-    def get_color(self):
-        """Returns the string color of the game piece"""
-        return self._color
+        if color == RED:
+            self._black ^= captured
+            self._hash ^= self.hash_squares(captured, BLACK)
+        else:
+            self._red ^= captured
+            self._hash ^= self.hash_squares(captured, RED)
+
+        return captured
+
+    def display(self, file=None):
+        """Prints the board to the passed in file, defaults to sys.stdout"""
+        size = self._size
+        red, black = self._red, self._black
+        lines = ['  ' + ' '.join(map(str, range(1, size + 1)))]
+        for row in range(size):
+            cells = []
+            for index in range(row * size, (row + 1) * size):
+                cells.append(SQUARE_SYMBOLS[(red >> index) & 1 | ((black >> index) & 1) << 1])
+            lines.append(chr(97 + row) + ' ' + ' '.join(cells) + ' ')
+
+        (sys.stdout if file is None else file).write('\n'.join(lines) + '\n')
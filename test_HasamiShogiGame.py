@@ -0,0 +1,157 @@
+# Description: Tests Board captures and that HasamiShogiGame.unmake_move takes back moves, including captures and wins.
+# Run with `python -m unittest` from the directory this repo is in.
+
+import unittest
+
+from HasamiShogiGame import Board, HasamiShogiGame, SQUARE_INDICES
+
+
+class CaptureTest(unittest.TestCase):
+    """Tests that Board.make_move removes exactly the pieces a move captures."""
+
+    # corner, the neighbor a piece waits on, and the origin and destination of a move onto the other neighbor
+    CORNER_CASES = [('a1', 'b1', 'a5', 'a2'), ('a9', 'b9', 'a5', 'a8'),
+                    ('i1', 'h1', 'i5', 'i2'), ('i9', 'h9', 'i5', 'i8')]
+
+    @staticmethod
+    def make_board(red_squares, black_squares):
+        """Returns a board holding only red pieces on red_squares and black pieces on black_squares"""
+        board = Board()
+        board._red = sum(1 << SQUARE_INDICES[square] for square in red_squares)
+        board._black = sum(1 << SQUARE_INDICES[square] for square in black_squares)
+        board._hash = board.hash_squares(board._black, 'BLACK') ^ board.hash_squares(board._red, 'RED')
+        return board
+
+    def assert_occupants(self, board, expected):
+        """Asserts every square in expected holds the expected color"""
+        for square, color in expected.items():
+            self.assertEqual(board.get_square_occupant_color(square), color, square)
+
+    def test_horizontal_run(self):
+        """A run of several pieces between the moved piece and a friendly piece in a row is captured"""
+        board = self.make_board(['e2', 'e3', 'e4'], ['e1', 'i5'])
+        self.assertTrue(board.make_move('i5', 'e5', 'BLACK'))
+        self.assert_occupants(board, {'e1': 'BLACK', 'e2': 'NONE', 'e3': 'NONE', 'e4': 'NONE', 'e5': 'BLACK'})
+        self.assertEqual(board.get_num_captured_pieces('RED'), 9)
+
+    def test_vertical_run(self):
+        """A run of several pieces between the moved piece and a friendly piece in a column is captured"""
+        board = self.make_board(['c7', 'd7', 'e7', 'a1'], ['b7', 'i7'])
+        self.assertTrue(board.make_move('i7', 'f7', 'BLACK'))
+        self.assert_occupants(board, {'b7': 'BLACK', 'c7': 'NONE', 'd7': 'NONE', 'e7': 'NONE', 'a1': 'RED'})
+
+    def test_run_ending_on_empty_square(self):
+        """A run that ends on an empty square is not captured"""
+        board = self.make_board(['e2', 'e3'], ['i4'])
+        self.assertTrue(board.make_move('i4', 'e4', 'BLACK'))
+        self.assert_occupants(board, {'e2': 'RED', 'e3': 'RED'})
+
+    def test_captures_in_several_directions(self):
+        """One move captures runs in every direction it closes"""
+        board = self.make_board(['e4', 'e6', 'd5'], ['e3', 'e7', 'c5', 'i5'])
+        self.assertTrue(board.make_move('i5', 'e5', 'BLACK'))
+        self.assert_occupants(board, {'e4': 'NONE', 'e6': 'NONE', 'd5': 'NONE', 'e5': 'BLACK'})
+        self.assertEqual(board._hash, board.hash_squares(board._black, 'BLACK'))
+
+    def test_no_wrap_east_from_last_column(self):
+        """A piece in column 9 is not sandwiched by a piece at the start of the next row"""
+        board = self.make_board(['e9'], ['f1', 'i8'])
+        self.assertTrue(board.make_move('i8', 'e8', 'BLACK'))
+        self.assert_occupants(board, {'e9': 'RED', 'f1': 'BLACK'})
+
+    def test_no_wrap_west_from_first_column(self):
+        """A piece in column 1 is not sandwiched by a piece at the end of the previous row"""
+        board = self.make_board(['e1'], ['d9', 'i2'])
+        self.assertTrue(board.make_move('i2', 'e2', 'BLACK'))
+        self.assert_occupants(board, {'e1': 'RED', 'd9': 'BLACK'})
+
+    def test_capture_against_edges(self):
+        """Runs ending against a friendly piece in the first or last column are captured"""
+        board = self.make_board(['e8'], ['e9', 'i7'])
+        self.assertTrue(board.make_move('i7', 'e7', 'BLACK'))
+        self.assert_occupants(board, {'e8': 'NONE'})
+        board = self.make_board(['e2'], ['e1', 'i3'])
+        self.assertTrue(board.make_move('i3', 'e3', 'BLACK'))
+        self.assert_occupants(board, {'e2': 'NONE'})
+
+    def test_corner_captures(self):
+        """A corner piece is captured when the moved piece and a friendly piece occupy both its neighbors"""
+        for corner, neighbor, from_square, to_square in self.CORNER_CASES:
+            with self.subTest(corner=corner):
+                board = self.make_board([corner], [neighbor, from_square])
+                self.assertTrue(board.make_move(from_square, to_square, 'BLACK'))
+                self.assert_occupants(board, {corner: 'NONE', neighbor: 'BLACK', to_square: 'BLACK'})
+
+                board = self.make_board([neighbor, from_square], [corner])
+                self.assertTrue(board.make_move(from_square, to_square, 'RED'))
+                self.assert_occupants(board, {corner: 'NONE'})
+
+    def test_corner_without_friendly_neighbor(self):
+        """Landing next to a corner does not capture it unless the other neighbor is friendly"""
+        for corner, neighbor, from_square, to_square in self.CORNER_CASES:
+            with self.subTest(corner=corner, neighbor='empty'):
+                board = self.make_board([corner], [from_square])
+                self.assertTrue(board.make_move(from_square, to_square, 'BLACK'))
+                self.assert_occupants(board, {corner: 'RED'})
+
+            with self.subTest(corner=corner, neighbor='enemy'):
+                board = self.make_board([corner, neighbor], [from_square])
+                self.assertTrue(board.make_move(from_square, to_square, 'BLACK'))
+                self.assert_occupants(board, {corner: 'RED', neighbor: 'RED'})
+
+
+class UnmakeMoveTest(unittest.TestCase):
+    """Tests that unmaking a move restores the board, captured counts, turn, game state, and hash."""
+
+    @staticmethod
+    def snapshot(game):
+        """Returns a tuple of everything about the game an unmade move must restore"""
+        return ([game.get_square_occupant(square) for square in SQUARE_INDICES],
+                game.get_num_captured_pieces('RED'), game.get_num_captured_pieces('BLACK'),
+                game.get_active_player(), game.get_game_state(), game._board._hash)
+
+    def test_unmake_capture(self):
+        """Unmaking a capturing move puts back the moved and captured pieces"""
+        game = HasamiShogiGame()
+        self.assertTrue(game.make_move('i1', 'e1'))
+        self.assertTrue(game.make_move('a2', 'e2'))
+        before = self.snapshot(game)
+
+        # red piece on e2 is sandwiched between black pieces on e1 and e3
+        self.assertTrue(game.make_move('i3', 'e3'))
+        self.assertEqual(game.get_square_occupant('e2'), 'NONE')
+        self.assertEqual(game.get_num_captured_pieces('RED'), 1)
+
+        self.assertTrue(game.unmake_move())
+        self.assertEqual(self.snapshot(game), before)
+        self.assertEqual(game.get_active_player(), 'BLACK')
+
+    def test_unmake_winning_move(self):
+        """Unmaking the move that wins the game returns the game to unfinished"""
+        game = HasamiShogiGame()
+        board = game._board
+        # leaves red with two pieces, one of which black can capture with i3 to e3
+        board._red = 1 << SQUARE_INDICES['e2'] | 1 << SQUARE_INDICES['a5']
+        board._black = 1 << SQUARE_INDICES['e1'] | 1 << SQUARE_INDICES['i3']
+        board._hash = board.hash_squares(board._black, 'BLACK') ^ board.hash_squares(board._red, 'RED')
+        before = self.snapshot(game)
+
+        self.assertTrue(game.make_move('i3', 'e3'))
+        self.assertEqual(game.get_game_state(), 'BLACK_WON')
+        self.assertFalse(game.make_move('a5', 'b5'))
+
+        self.assertTrue(game.unmake_move())
+        self.assertEqual(self.snapshot(game), before)
+        self.assertEqual(game.get_game_state(), 'UNFINISHED')
+        self.assertTrue(game.make_move('i3', 'e3'))
+
+    def test_unmake_without_history(self):
+        """Unmaking with no moves made returns False and changes nothing"""
+        game = HasamiShogiGame()
+        before = self.snapshot(game)
+        self.assertFalse(game.unmake_move())
+        self.assertEqual(self.snapshot(game), before)
+
+
+if __name__ == '__main__':
+    unittest.main()